@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+import sys
+import types
+
+sys.path.append("..")
+
+# app.py only needs bleak for its type hints and main(); stub it if missing
+try:
+    import bleak
+except ImportError:
+    for name in (
+        "bleak",
+        "bleak.backends",
+        "bleak.backends.characteristic",
+        "bleak.backends.device",
+        "bleak.backends.scanner",
+    ):
+        sys.modules[name] = types.ModuleType(name)
+    sys.modules["bleak"].BleakClient = object
+    sys.modules["bleak"].BleakScanner = object
+    sys.modules["bleak.backends.characteristic"].BleakGATTCharacteristic = object
+    sys.modules["bleak.backends.device"].BLEDevice = object
+    sys.modules["bleak.backends.scanner"].AdvertisementData = object
+
+import app
+import cobs
+from messages import ClearSlotResponse, ProgramFlowResponse
+
+
+class TestOnData(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        app.rx_buffer.clear()
+        app.pending_responses.clear()
+
+    def tearDown(self):
+        app.pending_responses.clear()
+        self.loop.close()
+
+    def expect(self, response_type):
+        future = self.loop.create_future()
+        app.pending_responses[response_type.ID] = future
+        return future
+
+    def test_fragmented_frame(self):
+        future = self.expect(ClearSlotResponse)
+        frame = cobs.pack(bytes((ClearSlotResponse.ID, 0x00)))
+        for i in range(len(frame)):
+            self.assertFalse(future.done())
+            app.on_data(None, bytearray(frame[i : i + 1]))
+        self.assertTrue(future.result().success)
+        self.assertEqual(app.rx_buffer, b"")
+
+    def test_multiple_frames_in_packet(self):
+        clear = self.expect(ClearSlotResponse)
+        flow = self.expect(ProgramFlowResponse)
+        data = cobs.pack(bytes((ClearSlotResponse.ID, 0x00)))
+        data += cobs.pack(bytes((ProgramFlowResponse.ID, 0x01)))
+        app.on_data(None, bytearray(data))
+        self.assertTrue(clear.result().success)
+        self.assertFalse(flow.result().success)
+
+    def test_bad_frames_are_skipped(self):
+        future = self.expect(ClearSlotResponse)
+        data = b"\x02" + b"\x01\x02"  # stray delimiter, lone priority byte
+        data += cobs.pack(bytes((ClearSlotResponse.ID,)))  # too short to deserialize
+        data += cobs.pack(bytes((ClearSlotResponse.ID, 0x00)))
+        with self.assertLogs(app.log, "ERROR"):
+            app.on_data(None, bytearray(data))
+        self.assertTrue(future.result().success)
+        self.assertEqual(app.rx_buffer, b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import sys
 
 sys.path.append("..")
-from cobs import encode, decode, pack, unpack
+from cobs import encode, decode, pack, unpack, DELIMITER, XOR_TABLE
 
 # fmt: off
 TEST_CASES = (
@@ -39,11 +39,31 @@ class TestCobs(unittest.TestCase):
         unpacked = unpack(packed)
         self.assertEqual(unpacked, data)
 
+    def test_encode_block_boundaries(self):
+        for size in (83, 84, 85, 167, 168, 169, 1000):
+            data = (bytes(range(3, 253)) * 4)[:size]
+            with self.subTest(size=size):
+                encoded = encode(data)
+                self.assertEqual(len(encoded), size + size // 84 + 1)
+                self.assertEqual(decode(encoded), data)
+                self.assertEqual(unpack(pack(data)), data)
+
     def test_pack_cases(self):
         for data, expected in TEST_CASES:
             with self.subTest(data=data, expected=expected):
                 self.assertEqual(pack(data), expected)
 
+    def test_pack_matches_encode(self):
+        for data, _ in TEST_CASES:
+            with self.subTest(data=data):
+                expected = encode(data).translate(XOR_TABLE) + bytes((DELIMITER,))
+                self.assertEqual(pack(data), expected)
+
+    def test_pack_memoryview(self):
+        for data, expected in TEST_CASES:
+            with self.subTest(data=data, expected=expected):
+                self.assertEqual(pack(memoryview(data)), expected)
+
     def test_unpack_cases(self):
         for expected, data in TEST_CASES:
             with self.subTest(data=data, expected=expected):
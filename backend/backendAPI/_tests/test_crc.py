@@ -0,0 +1,30 @@
+import unittest
+import sys
+from binascii import crc32
+
+sys.path.append("..")
+from crc import crc
+
+
+class TestCrc(unittest.TestCase):
+
+    def test_aligned(self):
+        data = b"12345678"
+        self.assertEqual(crc(data), crc32(data))
+
+    def test_padded(self):
+        for size in range(1, 12):
+            data = bytes(range(1, size + 1))
+            padded = data + b"\x00" * (-size % 4)
+            with self.subTest(size=size):
+                self.assertEqual(crc(data), crc32(padded))
+
+    def test_seed(self):
+        first, second = b"import runloop\n", b"runloop.run(main())"
+        running = crc(second, crc(first))
+        expected = crc32(second + b"\x00", crc32(first + b"\x00"))
+        self.assertEqual(running, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import struct
+import sys
+
+sys.path.append("..")
+from messages import (
+    deserialize,
+    ClearSlotResponse,
+    DeviceNotification,
+    InfoResponse,
+    ProgramFlowNotification,
+    TransferChunkRequest,
+)
+
+
+class TestMessages(unittest.TestCase):
+
+    def test_deserialize_status_response(self):
+        message = deserialize(bytes((ClearSlotResponse.ID, 0x00)))
+        self.assertIsInstance(message, ClearSlotResponse)
+        self.assertTrue(message.success)
+
+    def test_deserialize_info_response(self):
+        data = struct.pack("<BBBHBBHHHHH", 0x01, 1, 0, 34, 1, 2, 3, 20, 1000, 500, 0x81)
+        message = deserialize(data)
+        self.assertIsInstance(message, InfoResponse)
+        self.assertEqual(message.max_packet_size, 20)
+        self.assertEqual(message.max_chunk_size, 500)
+
+    def test_deserialize_program_flow_notification(self):
+        message = deserialize(bytes((ProgramFlowNotification.ID, 0x01)))
+        self.assertIsInstance(message, ProgramFlowNotification)
+        self.assertTrue(message.stop)
+
+    def test_deserialize_device_notification(self):
+        payload = struct.pack("<BB", 0x00, 100) + struct.pack("<BBh", 0x0D, 1, 250)
+        data = struct.pack("<BH", DeviceNotification.ID, len(payload)) + payload
+        message = deserialize(data)
+        self.assertIsInstance(message, DeviceNotification)
+        self.assertEqual(
+            message.messages,
+            [("Battery", (0x00, 100)), ("Distance", (0x0D, 1, 250))],
+        )
+
+    def test_serialize_into(self):
+        buffer = bytearray(TransferChunkRequest.buffer_size(16))
+        for chunk in (b"import motor\n", b"x" * 16, b""):
+            with self.subTest(chunk=chunk):
+                expected = TransferChunkRequest(0x12345678, chunk).serialize()
+                view = TransferChunkRequest.serialize_into(buffer, 0x12345678, chunk)
+                self.assertEqual(view, expected)
+
+    def test_deserialize_unknown(self):
+        with self.assertRaises(ValueError):
+            deserialize(b"\xfe\x00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,9 +24,12 @@ If the script detects an unexpected response, it will print an error message and
 Otherwise it will continue to run until the connection is lost or stopped by the user.
 (You can stop the script by pressing Ctrl+C in the terminal.)
 
-While the script is running, it will print information about the messages it sends and receives.
+While the script is running, it will log information about the messages it sends and receives.
+Set the log level to INFO to see the messages, or DEBUG to also see the raw frames.
 """
 
+import logging
+import operator
 import sys
 from typing import cast, TypeVar #, Dict
 
@@ -37,12 +40,13 @@ from messages import *
 from crc import crc
 
 import asyncio
+import functools
 from bleak import BleakClient, BleakScanner
 from bleak.backends.characteristic import BleakGATTCharacteristic
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 
-
+log = logging.getLogger(__name__)
 
 SCAN_TIMEOUT = 10.0
 """How long to scan for devices before giving up (in seconds)"""
@@ -59,6 +63,9 @@ TX_CHAR = "0000fd02-0002-1000-8000-00805f9b34fb"
 DEVICE_NOTIFICATION_INTERVAL_MS = 5000
 """The interval in milliseconds between device notifications"""
 
+PACKET_WINDOW = 8
+"""Maximum number of packets of a frame in flight at once"""
+
 EXAMPLE_SLOT = 0
 """The slot to upload the example program to"""
 
@@ -78,15 +85,6 @@ runloop.run(main())""".encode(
 )
 """The utf8-encoded example program to upload to the hub"""
 
-print("Example Program: ", memoryview(EXAMPLE_PROGRAM).tolist())
-
-answer = input(
-    f"This example will override the program in slot {EXAMPLE_SLOT} of the first hub found. Do you want to continue? [Y/n] "
-)
-if answer.strip().lower().startswith("n"):
-    print("Aborted by user.")
-    sys.exit(0)
-
 stop_event = asyncio.Event()
 
 UPLOAD_BOOL = False
@@ -100,10 +98,12 @@ async def user_confirmation():
 
 # Global Variables
 info_response: InfoResponse = None
-pending_response: tuple[int, asyncio.Future] = (-1, asyncio.Future())
+packet_size: int = None  # largest packet both the hub and the negotiated MTU allow
+pending_responses: dict[int, asyncio.Future] = {}  # awaited responses by message ID
 rx_char = None
 tx_char = None
 client: BleakClient = None
+rx_buffer = bytearray()  # received data not yet terminated by a delimiter
 
 # Function Definitions
 
@@ -118,61 +118,132 @@ def on_disconnect(_: BleakClient) -> None:
 
 def on_data(_: BleakGATTCharacteristic, data: bytearray) -> None:
     """Callback for when data is received from the hub."""
-    if data[-1] != 0x02:
-        # packet is not a complete message
-        # for simplicity, this example does not implement buffering
-        # and is therefore unable to handle fragmented messages
-        un_xor = bytes(map(lambda x: x ^ 3, data))  # un-XOR for debugging
-        print(f"Received incomplete message:\n {un_xor}")
-        return
-    print("Packed Data Received:", memoryview(data).tolist())
-    data = cobs.unpack(data)
+    # packets may hold part of a frame or several frames, so buffer them
+    # and handle every frame completed by a delimiter
+    rx_buffer.extend(data)
+    while (end := rx_buffer.find(cobs.DELIMITER)) != -1:
+        frame = bytes(rx_buffer[: end + 1])
+        del rx_buffer[: end + 1]
+        if frame[:-1] in (b"", b"\x01"):
+            # stray delimiter or lone priority byte, nothing to decode
+            continue
+        try:
+            on_frame(frame)
+        except Exception:
+            # a malformed frame must not hold up the frames behind it
+            log.exception("Error handling frame: %s", frame)
+
+    if rx_buffer and log.isEnabledFor(logging.DEBUG):
+        un_xor = bytes(rx_buffer).translate(cobs.XOR_TABLE)  # un-XOR for debugging
+        log.debug("Buffered incomplete message:\n %s", un_xor)
+
+def on_frame(frame: bytes) -> None:
+    """Handles a complete frame received from the hub."""
+    log.debug("Packed Data Received: %s", frame)
+    data = cobs.unpack(frame)
     try:
-        print("Unpacked Data Received:", data)
+        log.debug("Unpacked Data Received: %s", data)
         message = deserialize(data)
-        print(f"Deserialized Data Received: {message}")
-        if message.ID == pending_response[0]:
-            pending_response[1].set_result(message)
-        if isinstance(message, DeviceNotification):
-            # sort and print the messages in the notification
-            updates = list(message.messages)
-            updates.sort(key=lambda x: x[1])
-            lines = [f" - {x[0]:<10}: {x[1]}" for x in updates]
-            print("\n".join(lines))
+        log.info("Deserialized Data Received: %s", message)
+        future = pending_responses.get(message.ID)
+        if future is not None and not future.done():
+            future.set_result(message)
+        if isinstance(message, DeviceNotification) and log.isEnabledFor(logging.DEBUG):
+            # sort and log the messages in the notification
+            updates = sorted(message.messages, key=operator.itemgetter(1))
+            log.debug("\n".join(f" - {name:<10}: {values}" for name, values in updates))
 
     except ValueError as e:
         print(f"Error: {e}")
 
-async def send_message(message: BaseMessage) -> None:
+def build_chunk_frame(
+    chunk: bytes, running_crc: int, buffer: bytearray
+) -> tuple[int, TransferChunkRequest, bytearray]:
+    """Updates the running CRC with a chunk and builds its framed transfer request.
+
+    The request is serialized into buffer, which is reused across chunks."""
+    running_crc = crc(chunk, running_crc)
+    payload = TransferChunkRequest.serialize_into(buffer, running_crc, chunk)
+    return running_crc, TransferChunkRequest(running_crc, chunk), cobs.pack(payload)
+
+@functools.lru_cache(maxsize=8)
+def build_upload_frames(
+    program: bytes, chunk_size: int
+) -> tuple[int, tuple[tuple[TransferChunkRequest, bytearray], ...]]:
+    """Computes the CRC of a program and the framed transfer requests for its chunks.
+
+    The result only depends on the program and chunk size, so repeated uploads
+    of the same program reuse it instead of recomputing CRCs and frames."""
+    frames = []
+    running_crc = 0
+    buffer = bytearray(TransferChunkRequest.buffer_size(chunk_size))
+    for i in range(0, len(program), chunk_size):
+        chunk = program[i : i + chunk_size]
+        running_crc, request, frame = build_chunk_frame(chunk, running_crc, buffer)
+        frames.append((request, frame))
+    # with aligned chunks only the last one is padded, so the final running
+    # CRC already is the CRC of the whole program
+    program_crc = running_crc if chunk_size % 4 == 0 else crc(program)
+    return program_crc, tuple(frames)
+
+async def send_message(message: BaseMessage, frame: bytearray = None) -> None:
     global client
-    """Serializes and sends a message to the hub."""
-    print(f"Sending: {message}")
-    payload = message.serialize()
-    
-    print("PAYLOAD:", memoryview(payload).tolist())
-    frame = cobs.pack(payload)
-
-
-    # use the max_packet_size from the info response if available
+    """Serializes and sends a message to the hub, unless it was already packed into frame."""
+    log.info("Sending: %s", message)
+    if frame is None:
+        payload = message.serialize()
+        log.debug("PAYLOAD: %s", payload)
+        frame = cobs.pack(payload)
+
+    # use the negotiated packet size if available
     # otherwise, assume the frame is small enough to send in one packet
-    packet_size = info_response.max_packet_size if info_response else len(frame)
-
-    # send the frame in packets of packet_size
-    for i in range(0, len(frame), packet_size):
-        packet = frame[i : i + packet_size]
-        print("MESSAGE PACKET:", memoryview(packet).tolist())
-        await client.write_gatt_char(rx_char, packet, response=False)
-
-async def send_request(message: BaseMessage, response_type: type[TMessage]) -> TMessage:
+    size = packet_size or len(frame)
+
+    # send the frame in packets of packet_size, written without response and
+    # submitted together so the BLE stack can queue several per connection interval
+    window = asyncio.Semaphore(PACKET_WINDOW)
+
+    async def write_packet(packet: memoryview) -> None:
+        async with window:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("MESSAGE PACKET: %s", bytes(packet))
+            await client.write_gatt_char(rx_char, packet, response=False)
+
+    # packets are memoryview slices of the frame, so they are not copied
+    view = memoryview(frame)
+    writes = [
+        asyncio.create_task(write_packet(view[i : i + size]))
+        for i in range(0, len(view), size)
+    ]
+    try:
+        await asyncio.gather(*writes)
+    except BaseException:
+        # a failed write must not let the rest of the frame reach the hub
+        for write in writes:
+            write.cancel()
+        raise
+
+async def send_request(
+    message: BaseMessage, response_type: type[TMessage], frame: bytearray = None
+) -> TMessage:
     """Sends a message and waits for a specific type of response."""
-    global pending_response
-    pending_response = (response_type.ID, asyncio.Future())
-    await send_message(message)
-    return await pending_response[1]
+    future = asyncio.get_running_loop().create_future()
+    pending_responses[response_type.ID] = future
+    try:
+        await send_message(message, frame)
+        return await future
+    finally:
+        if pending_responses.get(response_type.ID) is future:
+            del pending_responses[response_type.ID]
 
 async def file_upload():
     """Handles the file upload process to the hub."""
 
+    # build (or reuse) the upload frames in a worker thread while the slot is cleared
+    upload_frames = asyncio.create_task(
+        asyncio.to_thread(build_upload_frames, EXAMPLE_PROGRAM, info_response.max_chunk_size)
+    )
+
     # clear the program in the example slot
     clear_response = await send_request(ClearSlotRequest(EXAMPLE_SLOT), ClearSlotResponse)
     if not clear_response.success:
@@ -181,7 +252,7 @@ async def file_upload():
         )
 
     # start a new file upload
-    program_crc = crc(EXAMPLE_PROGRAM)
+    program_crc, frames = await upload_frames
     start_upload_response = await send_request(
         StartFileUploadRequest("program.py", EXAMPLE_SLOT, program_crc),
         StartFileUploadResponse,
@@ -191,15 +262,9 @@ async def file_upload():
         sys.exit(1)
 
     # transfer the program in chunks
-    running_crc = 0
-    for i in range(0, len(EXAMPLE_PROGRAM), info_response.max_chunk_size):
-        chunk = EXAMPLE_PROGRAM[i : i + info_response.max_chunk_size]
-        running_crc = crc(chunk, running_crc)
-        print("Chunk ", i,": ", memoryview(chunk).tolist())
-        print("running_crc", running_crc)
-        chunk_response = await send_request(
-            TransferChunkRequest(running_crc, chunk), TransferChunkResponse
-        )
+    for i, (request, frame) in enumerate(frames):
+        log.debug("Chunk %d: %s, running_crc %d", i, request.payload, request.running_crc)
+        chunk_response = await send_request(request, TransferChunkResponse, frame)
         if not chunk_response.success:
             print(f"Error: failed to transfer chunk {i}")
             sys.exit(1)
@@ -213,7 +278,7 @@ async def file_upload():
         sys.exit(1)
 
 async def main():
-    global client, rx_char, tx_char, info_response
+    global client, rx_char, tx_char, info_response, packet_size
     print(f"\nScanning for {SCAN_TIMEOUT} seconds, please wait...")
     device = await BleakScanner.find_device_by_filter(
         filterfunc=match_service_uuid, timeout=SCAN_TIMEOUT
@@ -237,10 +302,25 @@ async def main():
         rx_char = service.get_characteristic(RX_CHAR)
         tx_char = service.get_characteristic(TX_CHAR)
 
+        # packets are written without response, which the hub must support
+        if "write-without-response" not in rx_char.properties:
+            print("Error: RX characteristic does not support write without response")
+            sys.exit(1)
+
+        # BlueZ only reports the negotiated MTU once it has been acquired
+        if client._backend.__class__.__name__ == "BleakClientBlueZDBus":
+            await client._backend._acquire_mtu()
+
+        rx_buffer.clear()
+        packet_size = None
         await client.start_notify(tx_char, on_data)
 
         info_response = await send_request(InfoRequest(), InfoResponse)
 
+        # an ATT write carries the MTU minus 3 bytes of header
+        packet_size = min(info_response.max_packet_size, client.mtu_size - 3)
+        log.info("MTU: %d, packet size: %d", client.mtu_size, packet_size)
+
         notification_response = await send_request(
             DeviceNotificationRequest(DEVICE_NOTIFICATION_INTERVAL_MS),
             DeviceNotificationResponse,
@@ -257,6 +337,14 @@ async def main():
 """ MAY NEED TO RUN THIS ONCE as __main__ DIRECTLY TO be prompted for Bluetooth permissions for Python"""
 
 if __name__ == "__main__":
+    answer = input(
+        f"This example will override the program in slot {EXAMPLE_SLOT} of the first hub found. Do you want to continue? [Y/n] "
+    )
+    if answer.strip().lower().startswith("n"):
+        print("Aborted by user.")
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.WARNING)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -2,10 +2,15 @@
 Example implementation of the Consistent Overhead Byte Stuffing (COBS) algorithm
 used by the SPIKE™ Prime BLE protocol.
 
-This implementation prioritizes readability and simplicity over performance and
-should be used for educational purposes only.
+Runs of bytes between delimiters are located with a regular expression and
+copied with slice operations, rather than processed byte by byte in Python.
 """
 
+import logging
+import re
+
+log = logging.getLogger(__name__)
+
 DELIMITER = 0x02
 """Delimiter used to mark end of frame"""
 
@@ -21,56 +26,93 @@ MAX_BLOCK_SIZE = 84
 XOR = 3
 """XOR mask for encoding"""
 
+XOR_TABLE = bytes(i ^ XOR for i in range(256))
+"""Translation table applying the XOR mask, for use with bytes.translate"""
 
-def encode(data: bytes):
+_IDENTITY_TABLE = bytes(range(256))
+
+_DELIMITER_PATTERN = re.compile(b"[\\x00-\\x%02x]" % DELIMITER)
+
+
+def _encode(data: bytes, table: bytes = None, framed: bool = False):
     """
-    Encode data using COBS algorithm, such that no delimiters are present.
+    COBS encode data, mapping every output byte through the translation table
+    (if any) as it is written and optionally terminating the result with an
+    untranslated delimiter.
     """
-    buffer = bytearray()
-
-    # Step 1: Start a new block
-    code_index = block = 0
-    def begin_block():
-        """Append code word to buffer and update code_index and block"""
-        nonlocal code_index, block
-        # 1.1: Set the index for the incomplete code word
-        code_index = len(buffer)  # index of incomplete code word
-        # 1.2: Append a placeholder for the code word, updated later
-        buffer.append(NO_DELIMITER)
-        # 1.3: Set initial block size to 1 (includes code word itself)
+    code_table = table or _IDENTITY_TABLE
+    search = _DELIMITER_PATTERN.search
+
+    # Step 1: Preallocate the exact worst case (no delimiters in data): the
+    # first code word, one more per full block, and room for the delimiter
+    n = len(data)
+    buffer = bytearray(n + n // MAX_BLOCK_SIZE + 1 + framed)
+
+    # Step 2: Begin the first block with a placeholder code word at index 0
+    buffer[0] = code_table[NO_DELIMITER]
+    code_index = 0
+    block = 1
+    pos = 1
+
+    i = 0
+    while True:
+        # Step 3: Find the next delimiter within the space left in the block
+        end = min(i + MAX_BLOCK_SIZE + 1 - block, n)
+        match = search(data, i, end)
+        stop = match.start() if match else end
+
+        # 3.1: Copy the run of non-delimiter bytes to the buffer in one slice
+        if stop > i:
+            run = data[i:stop]
+            size = stop - i
+            # (bytes() is free for bytes input and lets memoryview input be translated)
+            buffer[pos : pos + size] = bytes(run).translate(table) if table else run
+            pos += size
+            block += size
+            i = stop
+
+        if match:
+            # Step 4: Update code word for a block ending with delimiter
+            code = data[i] * MAX_BLOCK_SIZE + block + COBS_CODE_OFFSET
+            buffer[code_index] = code_table[code]
+            i += 1
+        elif block <= MAX_BLOCK_SIZE:
+            # Step 6: The data ended inside the block
+            break
+
+        # Step 5: Start a new block, leaving the placeholder code word in place
+        # if the block was completed at maximum size
+        buffer[pos] = code_table[NO_DELIMITER]
+        code_index = pos
+        pos += 1
         block = 1
 
-    # Step 2: Begin the first block
-    begin_block()
-
-    # Step 3: Iterate over the data bytes
-    for byte in data:
-        if byte > DELIMITER:
-            # 3.1: If byte is not a delimiter, add to buffer
-            buffer.append(byte)
-            block += 1
-
-        if byte <= DELIMITER or block > MAX_BLOCK_SIZE:
-            # Step 4: Complete the current block
-            if byte <= DELIMITER:
-                # 4.1: Update code word for a block ending with delimiter
-                delimiter_base = byte * MAX_BLOCK_SIZE
-                block_offset = block + COBS_CODE_OFFSET
-                buffer[code_index] = delimiter_base + block_offset
-            # Step 5: Start a new block
-            begin_block()
-
-    # Step 6: Update final code word
-    buffer[code_index] = block + COBS_CODE_OFFSET
+    # Step 7: Update final code word
+    buffer[code_index] = code_table[block + COBS_CODE_OFFSET]
+
+    # Step 8: Add delimiter to the end if framing, and drop the unused tail
+    if framed:
+        buffer[pos] = DELIMITER
+        pos += 1
+    del buffer[pos:]
 
     return buffer
 
 
+def encode(data: bytes):
+    """
+    Encode data using COBS algorithm, such that no delimiters are present.
+    """
+    return _encode(data)
+
+
 def decode(data: bytes):
     """
     Decode data using COBS algorithm.
     """
     buffer = bytearray()
+    buffer_extend = buffer.extend
+    buffer_append = buffer.append
 
     # Step 1: Define function to unescape code word and determine block properties
     def unescape(code: int):
@@ -85,43 +127,41 @@ def decode(data: bytes):
         return value, block
 
     # Step 2: Unescape the first code word
+    n = len(data)
+    i = 0
     value, block = unescape(data[0])
 
-    # Step 3: Iterate over data bytes to decode them
-    for byte in data[1:]:
-        block -= 1
-        if block > 0:
-            # 3.1: Append non-delimiter bytes to the buffer
-            buffer.append(byte)
-            continue
+    # Step 3: Jump from code word to code word, copying each block in one slice
+    while i + block < n:
+        # 3.1: Copy the non-delimiter bytes of the block to the buffer
+        buffer_extend(data[i + 1 : i + block])
 
         # Step 4: Handle completed block
         if value is not None:
             # 4.1: Append the value (escaped delimiter) to the buffer
-            buffer.append(value)
+            buffer_append(value)
 
         # Step 5: Unescape the next code word
-        value, block = unescape(byte)
+        i += block
+        value, block = unescape(data[i])
+
+    # Step 6: Copy the remainder of the final block, which has no delimiter
+    buffer_extend(data[i + 1 : i + block])
 
     return buffer
 
 
-def pack(data: bytes):
+def pack(data: bytes) -> bytearray:
     """
     Encode and frame data for transmission.
-    """
-    # Step 1: COBS encode the data
-    buffer = encode(data)
-    print("ENCODED:", buffer)
-
-    # Step 2: XOR buffer to remove problematic control characters
-    for i in range(len(buffer)):
-        buffer[i] ^= XOR
 
-    # Step 3: Add delimiter to the end
-    buffer.append(DELIMITER)
-    print("PACKED:", buffer)
-    return bytes(buffer)
+    COBS encoding, the XOR mask that removes problematic control characters and
+    the trailing delimiter are applied in a single pass over the data. The frame
+    is returned as the bytearray it was built in, to avoid a final copy.
+    """
+    buffer = _encode(data, XOR_TABLE, framed=True)
+    log.debug("PACKED: %s", buffer)
+    return buffer
 
 
 def unpack(frame: bytes):
@@ -134,7 +174,7 @@ def unpack(frame: bytes):
         start += 1
 
     # Step 2: XOR each byte of the unframed data to restore original data
-    unframed = bytes(map(lambda x: x ^ XOR, frame[start:-1]))
-    print("Unframed Data Received:", memoryview(unframed).tolist())
+    unframed = frame[start:-1].translate(XOR_TABLE)
+    log.debug("Unframed Data Received: %s", unframed)
     # Step 3: Decode the COBS-encoded data
     return bytes(decode(unframed))
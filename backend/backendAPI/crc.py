@@ -1,14 +1,19 @@
-from binascii import crc32 as _crc32
+import logging
+from zlib import crc32 as _crc32
+
+log = logging.getLogger(__name__)
 
 
 def crc(data: bytes, seed=0, align=4):
     """
     Calculate the CRC32 of data with an optional seed and alignment.
+
+    The data is treated as if zero-padded to a multiple of align; the padding
+    is fed to the CRC separately so the data itself is never copied.
     """
+    result = _crc32(data, seed)
     remainder = len(data) % align
     if remainder:
-        data += b"\x00" * (align - remainder)
-    print("Padded Data", data)
-    result = _crc32(data, seed)
-    print("CRC RESULT", result)
+        result = _crc32(bytes(align - remainder), result)
+    log.debug("CRC RESULT %d", result)
     return result
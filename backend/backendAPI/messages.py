@@ -2,6 +2,12 @@ from __future__ import annotations
 from abc import ABC
 import struct
 
+_STATUS_STRUCT = struct.Struct("<BB")
+_INFO_STRUCT = struct.Struct("<BBBHBBHHHHH")
+_NOTIFICATION_HEADER_STRUCT = struct.Struct("<BH")
+_CHUNK_HEADER_STRUCT = struct.Struct("<BIH")
+
+
 class BaseMessage(ABC):
     @property
     def ID(cls) -> int:
@@ -29,7 +35,7 @@ def StatusResponse(name: str, id: int):
 
         @staticmethod
         def deserialize(data: bytes):
-            id, status = struct.unpack("<BB", data)
+            id, status = _STATUS_STRUCT.unpack(data)
             return BaseStatusResponse(status == 0x00)
 
     BaseStatusResponse.__name__ = name
@@ -84,7 +90,7 @@ class InfoResponse(BaseMessage):
             max_message_size,
             max_chunk_size,
             product_group_device,
-        ) = struct.unpack("<BBBHBBHHHHH", data)
+        ) = _INFO_STRUCT.unpack(data)
         return InfoResponse(
             rpc_major,
             rpc_minor,
@@ -145,6 +151,24 @@ class TransferChunkRequest(BaseMessage):
         fmt = f"<BIH{self.size}s"
         return struct.pack(fmt, self.ID, self.running_crc, self.size, self.payload)
 
+    @staticmethod
+    def serialize_into(buffer: bytearray, running_crc: int, chunk: bytes) -> memoryview:
+        """
+        Serialize a chunk request into the start of a reusable buffer, which must
+        have room for the header and the chunk, and return a view of the result.
+        """
+        end = _CHUNK_HEADER_STRUCT.size + len(chunk)
+        _CHUNK_HEADER_STRUCT.pack_into(
+            buffer, 0, TransferChunkRequest.ID, running_crc, len(chunk)
+        )
+        buffer[_CHUNK_HEADER_STRUCT.size : end] = chunk
+        return memoryview(buffer)[:end]
+
+    @staticmethod
+    def buffer_size(chunk_size: int) -> int:
+        """Size of a buffer that can hold a serialized request for chunk_size bytes."""
+        return _CHUNK_HEADER_STRUCT.size + chunk_size
+
 
 TransferChunkResponse = StatusResponse("TransferChunkResponse", 0x11)
 
@@ -171,7 +195,7 @@ class ProgramFlowNotification(BaseMessage):
 
     @staticmethod
     def deserialize(data: bytes) -> ProgramFlowNotification:
-        id, stop = struct.unpack("<BB", data)
+        id, stop = _STATUS_STRUCT.unpack(data)
         return ProgramFlowNotification(bool(stop))
 
 
@@ -213,6 +237,10 @@ DEVICE_MESSAGE_MAP = {
     0x0E: ("3x3", "<BB9B"),
 }
 
+_DEVICE_MESSAGE_STRUCTS = {
+    id: (name, struct.Struct(fmt)) for id, (name, fmt) in DEVICE_MESSAGE_MAP.items()
+}
+
 
 class DeviceNotification(BaseMessage):
     ID = 0x3C
@@ -221,22 +249,21 @@ class DeviceNotification(BaseMessage):
         self.size = size
         self._payload = payload
         self.messages = []
-        data = payload[:]
-        while data:
-            id = data[0]
-            if id in DEVICE_MESSAGE_MAP:
-                name, fmt = DEVICE_MESSAGE_MAP[id]
-                size = struct.calcsize(fmt)
-                values = struct.unpack(fmt, data[:size])
+        offset = 0
+        while offset < len(payload):
+            id = payload[offset]
+            if id in _DEVICE_MESSAGE_STRUCTS:
+                name, message_struct = _DEVICE_MESSAGE_STRUCTS[id]
+                values = message_struct.unpack_from(payload, offset)
                 self.messages.append((name, values))
-                data = data[size:]
+                offset += message_struct.size
             else:
                 print(f"Unknown message: {id}")
                 break
 
     @staticmethod
     def deserialize(data: bytes) -> DeviceNotification:
-        id, size = struct.unpack("<BH", data[:3])
+        id, size = _NOTIFICATION_HEADER_STRUCT.unpack_from(data)
         if len(data) != size + 3:
             print(f"Unexpected size: {len(data)} != {size} + 3")
         return DeviceNotification(size, data[3:])
@@ -269,7 +296,7 @@ KNOWN_MESSAGES = {
 
 
 def deserialize(data: bytes):
-    message_type = data[0]
-    if message_type in KNOWN_MESSAGES:
-        return KNOWN_MESSAGES[message_type].deserialize(data)
-    raise ValueError(f"Unknown message: {data.hex(' ')}")
+    message_class = KNOWN_MESSAGES.get(data[0])
+    if message_class is None:
+        raise ValueError(f"Unknown message: {data.hex(' ')}")
+    return message_class.deserialize(data)
@@ -43,28 +43,28 @@ track = getTrack(programMessage) #list of services per step
 PROGRAM_EXECUTABLE = ""
 
 #he following lists will be assigned as appropriate
-hubImports : list[str] = [] #imports from hub will be merged into 'imports' (below list)
-imports : list[str] = [""] 
+hubImports : set[str] = set() #imports from hub, merged into 'imports' by setImports()
+componentImports : set[str] = set() #component imports, merged into 'imports' by setImports()
+imports : list[str] = [] #import lines, rebuilt by setImports()
 component_services : list[str] = []
 
 '''CURRENT compatible hub/component device index as follows'''
-HUB_MODULES : list[str] = ["light_matrix", "port"]
-COMPONENTS : list[str] = ["motor", "color_sensor", "distance_sensor", "force_sensor"]
+HUB_MODULES : frozenset[str] = frozenset({"light_matrix", "port"})
+COMPONENTS : frozenset[str] = frozenset({"motor", "color_sensor", "distance_sensor", "force_sensor"})
 
 def check_imports(value):
     if value in HUB_MODULES:
-        hubImports.append(value)
+        hubImports.add(value)
     if value in COMPONENTS:
-        if "port" not in hubImports:
-            hubImports.append("port")
-        imports.append(f"import {value}")
-        if value == COMPONENTS[1]:
-            imports.append("import color")
+        hubImports.add("port")
+        componentImports.add(f"import {value}")
+        if value == "color_sensor":
+            componentImports.add("import color")
 
 def setImports():
     for item in devices:
         check_imports(item)
-    imports[0] = ("from hub import {}".format(", ".join(hubImports)))
+    imports[:] = ["from hub import {}".format(", ".join(sorted(hubImports))), *sorted(componentImports)]
 
 setImports()
 PROGRAM_EXECUTABLE = "\n".join(imports)